@@ -1,12 +1,10 @@
 
 import math
-import scipy
 import numpy as np
 from dataclasses import dataclass, field
-from typing import Dict, Tuple
+from typing import Dict
 
-from bgai.santorini import BOARD_SHAPE, BOARD_SIZE, Santorini
-from bgai.visualize import render_path
+from bgai.santorini import POLICY_SIZE, Santorini
 
 import logging
 log = logging.getLogger(__name__)
@@ -69,36 +67,44 @@ def mcts(game: Santorini):
 
     if game.turn < NUM_SAMPLING_MOVES:
         # Select action proportional to softmax of visit count
-        actions, visit_counts = zip(*tuple((action, child.visit_count) for action, child in root.children.items()))
-        action = actions[np.random.choice(len(actions), p=scipy.special.softmax(visit_counts))]
+        action_ids, visit_counts = zip(*tuple((action_id, child.visit_count) for action_id, child in root.children.items()))
+        action_id = action_ids[np.random.choice(len(action_ids), p=softmax(visit_counts))]
     else:
         # Select the action that was visited most often
-        action = max(root.children.keys(), key=lambda action: root.children[action].visit_count)
+        action_id = max(root.children.keys(), key=lambda action_id: root.children[action_id].visit_count)
     
-    return action, root
+    return action_id, root
+
+
+def softmax(x):
+    # Numerically stable softmax, avoids importing scipy (and its startup cost) for a single function.
+    e = np.exp(np.asarray(x, dtype=np.float64) - np.max(x))
+    return e / e.sum()
 
 
 def expand(node: Node, add_exploration_noise: bool = False):
     #TODO: Actually get prediction and legal actions. (Represent legal actions as 2* 4d?)
     value = 1.0 if node.terminal else 0.0
-    policy_logits = np.ones(shape=(2, BOARD_SIZE, BOARD_SIZE, BOARD_SIZE, BOARD_SIZE), dtype=np.int_)
+    # Flat over the integer action ids, see `POLICY_SHAPE` for the layout.
+    policy_logits = np.ones(shape=POLICY_SIZE, dtype=np.int_)
 
     if not node.terminal:
         # Softmax applied only over legal moves
-        policy = {action: math.exp(policy_logits[action.as_tuple(node.game)]) for action in node.game.get_legal_actions()}
+        policy = {action_id: math.exp(policy_logits[action_id]) for action_id in node.game.get_legal_action_ids()}
         policy_sum = sum(policy.values())
 
         if policy:
-            for action, p in policy.items():
+            for action_id, p in policy.items():
                 prior = p / policy_sum
 
                 if add_exploration_noise:
                     prior *= 1 - ROOT_EXPLORATION_FRACTION
                     prior += np.random.gamma(ROOT_DIRICHLET_ALPHA, 1, 1) * ROOT_EXPLORATION_FRACTION
 
-                node.children[action] = Node(
-                    game=node.game.apply_legal_action(action),
-                    terminal=node.game.is_winning_action(action),
+                game = node.game.apply_legal_action_id(action_id)
+                node.children[action_id] = Node(
+                    game=game,
+                    terminal=node.game.is_winning_action_id(action_id, next_game=game),
                     prior=prior
                 )
         else:
@@ -1,10 +1,13 @@
-from concurrent.futures import ThreadPoolExecutor
-from functools import partial
-from queue import Empty, Queue
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass
+from queue import Empty, Full, Queue
+from threading import Condition, Event
+from time import perf_counter
+from typing import Callable, Iterable, NamedTuple
 import numpy as np
 from datetime import date, datetime, timedelta
 from bgai.alphazero.mcts import Node, mcts
-from bgai.santorini import BOARD_SIZE, Santorini
+from bgai.santorini import POLICY_SHAPE, POLICY_SIZE, Santorini
 import bgai.timer as timer
 
 import logging
@@ -12,7 +15,7 @@ log = logging.getLogger(__name__)
 
 
 class SantoriniTracker:
-    POLICY_SHAPE = (2, BOARD_SIZE, BOARD_SIZE, BOARD_SIZE, BOARD_SIZE)
+    POLICY_SHAPE = POLICY_SHAPE
 
     def __init__(self):
         self.states = []
@@ -29,59 +32,122 @@ class SantoriniTracker:
         ))
 
         total_visits = sum(map(lambda c: c.visit_count, root.children.values()))
-        visits_array = np.zeros(shape=self.POLICY_SHAPE, dtype=np.int_)
-        for action, child in root.children.items():
-            visits_array[action.as_tuple(game)] = child.visit_count / total_visits
+        visits_array = np.zeros(shape=POLICY_SIZE, dtype=np.float32)
+        for action_id, child in root.children.items():
+            visits_array[action_id] = child.visit_count / total_visits
+        visits_array = visits_array.reshape(self.POLICY_SHAPE)
 
         self.states.append(game_array)
         self.visits.append(visits_array)
         self.action_count += 1
 
 
+class Batch(NamedTuple):
+    states: np.ndarray
+    visits: np.ndarray
+
+
+@dataclass
+class StageMetrics:
+    name:       str
+    items:      int     = 0
+    busy:       float   = 0.0
+    # Waiting on input from the previous stage.
+    stalled:    float   = 0.0
+    # Waiting on the next stage to accept output, i.e. this stage is ahead.
+    blocked:    float   = 0.0
+
+    def summary(self, elapsed: float):
+        return f"{self.name:<8} | {self.items} items ({self.items / elapsed:.2f}/s) | busy {self.busy:.2f}s | stalled {self.stalled:.2f}s ({self.stalled / elapsed:.0%}) | blocked {self.blocked:.2f}s ({self.blocked / elapsed:.0%})"
+
+
+def augment(state: np.ndarray, visits: np.ndarray):
+    # The board has the symmetries of a square, apply one of the 8 at random to both the state and the policy target.
+    k, flip = np.random.randint(4), np.random.randint(2)
+
+    state = np.rot90(state, k, axes=(1, 2))
+    visits = np.rot90(np.rot90(visits, k, axes=(1, 2)), k, axes=(3, 4))
+    if flip:
+        state = np.flip(state, axis=2)
+        visits = np.flip(visits, axis=(2, 4))
+
+    return state, visits
+
+
 class TrainerLink:
     def __init__(self, window_size: int, batch_size: int, fetch_min_wait: int):
         self._queue = Queue()
         self._window = []
+        self._window_changed = Condition()
         self._last_fetch = datetime.now()
 
         self.online = True
         self.window_size = window_size
         self.batch_size = batch_size
         self.fetch_min_wait = fetch_min_wait
+
+        # A (version, snapshot) pair, kept in one attribute so runners never see a version with the wrong snapshot.
+        self.snapshot = (0, None)
     
     def publish_tracker(self, tracker: SantoriniTracker):
         self._queue.put(tracker)
+
+    def publish_snapshot(self, snapshot, version: int):
+        # Runners read the snapshot when they start a new game, a single attribute swap is enough for that.
+        self.snapshot = (version, snapshot)
     
     def move_trackers_from_queue_to_window(self):
+        # Returns the number of moved trackers and the seconds spent blocked on the queue.
+        moved = 0
+        waited = 0.0
         done = False
         while not done:
             maximum_wait = self.fetch_min_wait - (datetime.now() - self._last_fetch).total_seconds()
+            start = perf_counter()
             try:
                 if maximum_wait > 0:
                     tracker = self._queue.get(block=True, timeout=maximum_wait)
                 else:
                     tracker = self._queue.get(block=False, timeout=None)
-
-                if len(self._window) >= self.window_size:
-                    self._window.pop(0)
-                
-                self._window.append(tracker)
+                waited += perf_counter() - start
+
+                with self._window_changed:
+                    if len(self._window) >= self.window_size:
+                        self._window.pop(0)
+                    
+                    self._window.append(tracker)
+                    self._window_changed.notify_all()
+                moved += 1
             except Empty:
+                waited += perf_counter() - start
                 done = True
                 self._last_fetch = datetime.now()
+        
+        return moved, waited
+    
+    def wait_for_window(self, timeout: float):
+        with self._window_changed:
+            return self._window_changed.wait_for(lambda: any(tracker.action_count for tracker in self._window), timeout=timeout)
     
     def sample_batch(self):
-        total_actions = sum(tracker.action_count for tracker in self._window)
-        tracker_selection = np.random.choice(
-            self._window,
-            size=self.batch_size,
-            p=[len(tracker.action_count) / total_actions for tracker in self._window]
-        )
-        action_selection = [(tracker, np.random.randint(len(tracker.action_count))) for tracker in tracker_selection]
-
-        # Implement sample creation (turn game into img etc)
-        # return [ for tracker, action_index in tracker_selection]
-
+        with self._window_changed:
+            window = tuple(self._window)
+
+        # The window can lose its last game with actions between `wait_for_window` and this call, there is nothing to sample then.
+        action_counts = np.array([tracker.action_count for tracker in window])
+        if not action_counts.sum():
+            return None
+
+        tracker_selection = np.random.choice(len(window), size=self.batch_size, p=action_counts / action_counts.sum())
+
+        states, visits = [], []
+        for t in tracker_selection:
+            action_index = np.random.randint(window[t].action_count)
+            state, visit = augment(window[t].states[action_index], window[t].visits[action_index])
+            states.append(state)
+            visits.append(visit)
+        
+        return Batch(np.stack(states), np.stack(visits))
 
 
 def selfplay(link: TrainerLink):
@@ -96,33 +162,138 @@ def selfplay(link: TrainerLink):
         log.info(f"Starting turn {turn_counter}")
 
         with timer.Timer():
-            action, root = mcts(game)
+            action_id, root = mcts(game)
         tracker.track_statistics(game, root)
 
-        is_terminal = game.is_winning_action(action)
-        game = game.apply_legal_action(action)
+        next_game = game.apply_legal_action_id(action_id)
+        is_terminal = game.is_winning_action_id(action_id, next_game=next_game)
+        game = next_game
 
     return tracker
 
 
 def runner(runner_id: int, link: TrainerLink):
-    log.info(f"Runner {runner_id} is starting a new game.")
+    version, _ = link.snapshot
+    log.info(f"Runner {runner_id} is starting a new game with snapshot {version}.")
 
     tracker = selfplay(link)
     link.publish_tracker(tracker)
 
 
-def trainer(link: TrainerLink):
-    # TODO: Enter loop in which games will be pulled from the queue and sample batches will be used to train and publish the new network
+def runner_loop(runner_id: int, link: TrainerLink):
+    try:
+        while link.online:
+            runner(runner_id, link)
+    except Exception:
+        log.exception(f"Runner {runner_id} failed, disabling the trainer link.")
+        link.online = False
+        raise
+
+
+def placeholder_train_step(batch: Batch):
+    """ There is no network to train yet, so this does nothing and publishes `None` as the snapshot. """
+    return None
+
+
+def ingest_stage(link: TrainerLink, stop: Event, metrics: StageMetrics):
+    while not stop.is_set():
+        start = perf_counter()
+        moved, waited = link.move_trackers_from_queue_to_window()
 
-    link.move_trackers_from_queue_to_window()
-    log.info(f"Link window currently has size {len(link._window)}")
+        metrics.items += moved
+        metrics.stalled += waited
+        metrics.busy += perf_counter() - start - waited
+
+
+def sample_stage(link: TrainerLink, buffer: Queue, stop: Event, metrics: StageMetrics):
+    while not stop.is_set():
+        start = perf_counter()
+        if not link.wait_for_window(timeout=0.1):
+            metrics.stalled += perf_counter() - start
+            continue
+
+        start = perf_counter()
+        batch = link.sample_batch()
+        if batch is None:
+            metrics.stalled += perf_counter() - start
+            continue
+        metrics.busy += perf_counter() - start
+
+        start = perf_counter()
+        while not stop.is_set():
+            try:
+                buffer.put(batch, timeout=0.1)
+                metrics.items += 1
+                break
+            except Full:
+                pass
+        metrics.blocked += perf_counter() - start
+
+
+def _raise_failed(futures: Iterable[Future]):
+    for future in futures:
+        if future.done():
+            future.result()
+
+
+def trainer(link: TrainerLink, steps: int, train_step: Callable[[Batch], object] = placeholder_train_step, snapshot_interval: int = 10, buffer_size: int = 2, runners: Iterable[Future] = ()):
+    """
+    Runs `steps` training steps while ingesting games and assembling batches on background threads.
+
+    Batches are handed to the training step through a bounded buffer, with the default size of two the sampler fills
+    one batch while the training step consumes the other. Every `snapshot_interval` steps and after the final step the
+    snapshot returned by `train_step` is published to the runners. Exceptions of the stages and of the `runners`
+    futures are raised from here.
+    """
+    runners = tuple(runners)
+    buffer = Queue(maxsize=buffer_size)
+    stop = Event()
+    metrics = {name: StageMetrics(name) for name in ("ingest", "sample", "train")}
+
+    started = perf_counter()
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        stages = (
+            executor.submit(ingest_stage, link, stop, metrics["ingest"]),
+            executor.submit(sample_stage, link, buffer, stop, metrics["sample"]),
+        ) + runners
+
+        try:
+            for step in range(steps):
+                start = perf_counter()
+                while True:
+                    # Surface exceptions from the stages and runners instead of waiting on a buffer that may never fill
+                    _raise_failed(stages)
+                    try:
+                        batch = buffer.get(timeout=0.1)
+                        break
+                    except Empty:
+                        pass
+                metrics["train"].stalled += perf_counter() - start
+
+                start = perf_counter()
+                snapshot = train_step(batch)
+                metrics["train"].busy += perf_counter() - start
+                metrics["train"].items += 1
+
+                if (step + 1) % snapshot_interval == 0 or step + 1 == steps:
+                    version = link.snapshot[0] + 1
+                    link.publish_snapshot(snapshot, version)
+                    log.info(f"Step {step} | Published snapshot {version} | Link window currently has size {len(link._window)}")
+        finally:
+            stop.set()
+
+    elapsed = perf_counter() - started
+    for stage_metrics in metrics.values():
+        log.info(stage_metrics.summary(elapsed))
+
+    return metrics
 
 
 def main(threads: int, steps=5):
     log.info("Starting the training main function")
     link = TrainerLink(
         window_size=50,
+        batch_size=32,
         fetch_min_wait=1
     )
 
@@ -131,17 +302,18 @@ def main(threads: int, steps=5):
         for step in range(steps):
             log.info(f"Step {step}")
             runner(runner_id=0, link=link)
-            trainer(link)
+            trainer(link, steps=1)
     else:
         log.info(f"Creating ThreadPoolExecutor with {threads} threads")
         with ThreadPoolExecutor(max_workers=threads) as executor:
-            executor.map(partial(runner, link=link), range(threads))
-
-            for _ in range(steps):
-                trainer(link)
+            runners = [executor.submit(runner_loop, runner_id, link) for runner_id in range(threads)]
 
-            log.info("Disabling the trainer link to stop the runners.")
-            link.online = False
+            try:
+                trainer(link, steps=steps, runners=runners)
+            finally:
+                # Also stop the runners when the trainer fails, otherwise leaving the executor waits on them forever.
+                log.info("Disabling the trainer link to stop the runners.")
+                link.online = False
         
     log.info("Finished")
 
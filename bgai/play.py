@@ -1,4 +1,3 @@
-from lib2to3.pytree import Base
 import sys
 from typing import Tuple
 import click
@@ -7,7 +6,7 @@ from bgai.player import PLAYER_TYPES, BasePlayer
 
 log = logging.getLogger(__name__)
 
-from bgai.visualize import render_history
+from bgai.record import GameRecord, write_records
 from bgai.santorini import DIRECTIONS, Action, Position, Santorini
 
 
@@ -40,7 +39,8 @@ def play_game(game: Santorini, players: Tuple[BasePlayer]):
 @click.argument("player_a", type=click.Choice(PLAYER_TYPES.keys(), case_sensitive=False))
 @click.argument("player_b", type=click.Choice(PLAYER_TYPES.keys(), case_sensitive=False))
 @click.option("--html", default=None, type=click.Path(resolve_path=True))
-def cli(player_a, player_b, html):
+@click.option("--record", default=None, type=click.Path(resolve_path=True))
+def cli(player_a, player_b, html, record):
     log.info(f"Called the cli with arguments: {sys.argv}")
 
     players = PLAYER_TYPES[player_a](0, 'R'), PLAYER_TYPES[player_b](1, 'M')
@@ -50,10 +50,17 @@ def cli(player_a, player_b, html):
     history = play_game(game, players)
 
     if html is not None:
+        # Imported lazily, plotly (and pandas through plotly.express) is slow to import and only needed here.
+        from bgai.visualize import render_history
+
         log.info(f"Writing the game to {html}")
         fig = render_history(game, history)
         fig.write_html(html)
 
+    if record is not None:
+        log.info(f"Writing the game record to {record}")
+        write_records(record, [GameRecord.from_history(game, history)])
+
 
 if __name__ == "__main__":
     logging.basicConfig(level=logging.DEBUG)
@@ -1,7 +1,6 @@
-from multiprocessing.sharedctypes import Value
 import random
 from bgai.alphazero.mcts import mcts
-from bgai.santorini import Santorini
+from bgai.santorini import Action, Santorini
 
 import logging
 log = logging.getLogger(__name__)
@@ -52,7 +51,7 @@ class MctsPlayer(BasePlayer):
     player_type = 'mcts'
 
     def get_action(self, game: Santorini):
-        return mcts(game)[0]
+        return Action.from_index(game, mcts(game)[0])
 
 
 class InputPlayer(BasePlayer):
@@ -0,0 +1,157 @@
+from typing import Iterable, Iterator, NamedTuple, Tuple
+
+import numpy as np
+import numpy.typing as npt
+
+from bgai.santorini import BOARD_SHAPE, BOARD_SIZE, POLICY_SHAPE, Action, Player, Position, Santorini
+
+import logging
+log = logging.getLogger(__name__)
+
+# File layout: a fixed header, an index with one entry per game and then all actions of all games back to back.
+# The index entries hold the initial worker placement (as flat board indices), the number of plies and the offset
+# of the first action in the action block, so any single game can be read without touching the others.
+MAGIC = b"BGAR"
+VERSION = 1
+HEADER_DTYPE = np.dtype([('magic', 'S4'), ('version', '<u4'), ('games', '<u8')])
+INDEX_DTYPE = np.dtype([('workers', 'u1', (4,)), ('length', '<u2'), ('offset', '<u8')])
+ACTION_DTYPE = np.dtype('<u2')
+
+
+class GameRecord(NamedTuple):
+    # Flat board indices of worker_0, worker_1 of player 0 followed by those of player 1.
+    workers: npt.NDArray
+    # One index into the flattened policy array (see `POLICY_SHAPE`) per ply.
+    actions: npt.NDArray
+
+    def __len__(self):
+        return len(self.actions)
+
+    @staticmethod
+    def from_history(game: Santorini, history: Iterable[Action]) -> 'GameRecord':
+        if game._board.any() or game.turn != 0:
+            raise ValueError("Game records can only be created for games that start on an empty board at turn 0")
+
+        workers = np.array([np.ravel_multi_index(worker, BOARD_SHAPE) for worker in game.workers], dtype=np.uint8)
+        actions = []
+        for action in history:
+            actions.append(action.as_index(game))
+            game = game.apply_legal_action(action)
+
+        return GameRecord(workers, np.array(actions, dtype=ACTION_DTYPE))
+
+    def initial_game(self, markers: Tuple[str] = ('0', '1')) -> Santorini:
+        positions = [Position(*divmod(int(worker), BOARD_SIZE)) for worker in self.workers]
+        return Santorini(
+            Player(*positions[0:2], marker=markers[0]),
+            Player(*positions[2:4], marker=markers[1]),
+        )
+
+    def iter_games(self, markers: Tuple[str] = ('0', '1')) -> Iterator[Santorini]:
+        game = self.initial_game(markers)
+        yield game
+
+        for index in self.actions:
+            game = game.apply_legal_action_id(index)
+            yield game
+
+    def to_history(self, markers: Tuple[str] = ('0', '1')) -> Tuple[Santorini, Tuple[Action]]:
+        initial_game = game = self.initial_game(markers)
+        history = []
+
+        for index in self.actions:
+            action = Action.from_index(game, index)
+            history.append(action)
+            game = game.apply_legal_action(action)
+
+        return initial_game, tuple(history)
+
+
+def write_records(path: str, records: Iterable[GameRecord]):
+    records = tuple(records)
+
+    header = np.zeros(1, dtype=HEADER_DTYPE)
+    header[0] = (MAGIC, VERSION, len(records))
+
+    index = np.zeros(len(records), dtype=INDEX_DTYPE)
+    lengths = np.array([len(record) for record in records], dtype=np.uint64)
+    index['workers'] = [record.workers for record in records] if records else np.empty((0, 4))
+    index['length'] = lengths
+    index['offset'] = np.cumsum(lengths) - lengths
+
+    with open(path, 'wb') as f:
+        f.write(header.tobytes())
+        f.write(index.tobytes())
+        for record in records:
+            f.write(np.asarray(record.actions, dtype=ACTION_DTYPE).tobytes())
+
+    log.info(f"Wrote {len(records)} game records with {int(lengths.sum())} actions to {path}")
+
+
+class GameRecordFile:
+    """ Memory maps a file written by `write_records`, games are only read from disk when they are accessed. """
+
+    def __init__(self, path: str):
+        header = np.fromfile(path, dtype=HEADER_DTYPE, count=1)
+        if len(header) != 1 or header[0]['magic'] != MAGIC:
+            raise ValueError(f"{path} is not a game record file")
+        if header[0]['version'] != VERSION:
+            raise ValueError(f"Unsupported game record version {header[0]['version']} in {path}")
+
+        games = int(header[0]['games'])
+        self.path = path
+        self._index = np.memmap(path, dtype=INDEX_DTYPE, mode='r', offset=HEADER_DTYPE.itemsize, shape=(games,))
+        self._actions = np.memmap(path, dtype=ACTION_DTYPE, mode='r', offset=HEADER_DTYPE.itemsize + INDEX_DTYPE.itemsize * games)
+
+    def __len__(self):
+        return len(self._index)
+
+    def __getitem__(self, i: int) -> GameRecord:
+        entry = self._index[i]
+        offset = int(entry['offset'])
+        return GameRecord(np.array(entry['workers']), np.array(self._actions[offset:offset + int(entry['length'])]))
+
+    def __iter__(self) -> Iterator[GameRecord]:
+        for i in range(len(self)):
+            yield self[i]
+
+    @property
+    def lengths(self) -> npt.NDArray:
+        return np.array(self._index['length'])
+
+
+def replay(records: Iterable[GameRecord]) -> Tuple[npt.NDArray, npt.NDArray, npt.NDArray]:
+    """
+    Replays many games at once, every ply is applied to all games that are still running in a single vectorized step.
+
+    Returns the boards with shape (games, plies + 1, 5, 5), the flat worker positions with shape (games, plies + 1, 4)
+    and the length of each game. Games that ended before the longest game keep repeating their final state.
+    """
+    records = tuple(records)
+    games = len(records)
+    lengths = np.array([len(record) for record in records], dtype=np.int_)
+    plies = int(lengths.max()) if games else 0
+
+    actions = np.zeros(shape=(games, plies), dtype=np.int_)
+    for g, record in enumerate(records):
+        actions[g, :lengths[g]] = record.actions
+
+    worker_idx, dest_y, dest_x, build_y, build_x = np.unravel_index(actions, POLICY_SHAPE)
+    destinations = dest_y * BOARD_SIZE + dest_x
+    builds = build_y * BOARD_SIZE + build_x
+
+    boards = np.zeros(shape=(games, plies + 1, BOARD_SIZE * BOARD_SIZE), dtype=np.int8)
+    workers = np.zeros(shape=(games, plies + 1, 4), dtype=np.uint8)
+    workers[:, 0] = [record.workers for record in records] if records else np.empty((0, 4))
+
+    for t in range(plies):
+        boards[:, t + 1] = boards[:, t]
+        workers[:, t + 1] = workers[:, t]
+
+        active = np.flatnonzero(lengths > t)
+        # Worker slots are ordered by player, so the current player's workers are at 2 * player_id + worker index.
+        slots = 2 * (t % 2) + worker_idx[active, t]
+        workers[active, t + 1, slots] = destinations[active, t]
+        boards[active, t + 1, builds[active, t]] += 1
+
+    return boards.reshape(games, plies + 1, *BOARD_SHAPE), workers, lengths
@@ -1,5 +1,4 @@
 import random
-from tokenize import Name
 from typing import NamedTuple, Tuple
 from itertools import combinations, product
 from dataclasses import dataclass, field
@@ -17,6 +16,10 @@ BOARD_SHAPE = BOARD_SIZE, BOARD_SIZE
 BOARD_PLACES = tuple(product(range(BOARD_SIZE), repeat=2))
 DIRECTIONS = tuple((i, j) for i in (-1, 0, 1) for j in (-1, 0, 1) if not (i == 0 and j == 0))
 
+# The action space as (worker index, destination y, destination x, build y, build x), 1250 entries in total.
+POLICY_SHAPE = (2, BOARD_SIZE, BOARD_SIZE, BOARD_SIZE, BOARD_SIZE)
+POLICY_SIZE = int(np.prod(POLICY_SHAPE))
+
 
 class Position(NamedTuple):
     y: int
@@ -34,6 +37,35 @@ class Position(NamedTuple):
         return Position(self.y + other[0], self.x + other[1])
 
 
+# Integer action ids index the flattened policy array, id = worker index * 625 + destination * 25 + build where the
+# positions are flattened board indices. The tables below decode ids without building `Action` tuples in the search.
+WORKER_ACTIONS = POLICY_SIZE // 2
+ACTION_WORKER_INDEX = tuple(i // WORKER_ACTIONS for i in range(POLICY_SIZE))
+ACTION_DESTINATION = tuple(Position(*divmod(i % WORKER_ACTIONS // BOARD_SIZE ** 2, BOARD_SIZE)) for i in range(POLICY_SIZE))
+ACTION_BUILD = tuple(Position(*divmod(i % BOARD_SIZE ** 2, BOARD_SIZE)) for i in range(POLICY_SIZE))
+
+
+def _action_candidates(worker: Position):
+    candidates = []
+    for move_direction in DIRECTIONS:
+        destination = worker + move_direction
+        if not all(0 <= axis < BOARD_SIZE for axis in destination):
+            continue
+
+        builds = []
+        for build_direction in DIRECTIONS:
+            build = destination + build_direction
+            if all(0 <= axis < BOARD_SIZE for axis in build):
+                builds.append(((destination.y * BOARD_SIZE + destination.x) * BOARD_SIZE ** 2 + build.y * BOARD_SIZE + build.x, build))
+        
+        candidates.append((destination, tuple(builds)))
+    return tuple(candidates)
+
+
+# For a worker on each board position, the destinations on the board with the (id offset, build) pairs on the board.
+ACTION_CANDIDATES = {Position(*place): _action_candidates(Position(*place)) for place in BOARD_PLACES}
+
+
 @dataclass(frozen=True, eq=False)
 class Player:
     worker_0: Position
@@ -74,6 +106,21 @@ class Action(NamedTuple):
             self.build.x,
         )
 
+    def as_index(self, game: 'Santorini') -> int:
+        return (
+            game.current_player.workers.index(self.worker) * WORKER_ACTIONS
+            + (self.destination.y * BOARD_SIZE + self.destination.x) * BOARD_SIZE ** 2
+            + self.build.y * BOARD_SIZE + self.build.x
+        )
+
+    @staticmethod
+    def from_index(game: 'Santorini', index: int) -> 'Action':
+        return Action(
+            game.current_player.workers[ACTION_WORKER_INDEX[index]],
+            ACTION_DESTINATION[index],
+            ACTION_BUILD[index],
+        )
+
 
 @dataclass(frozen=True, eq=False)
 class Santorini:
@@ -117,12 +164,22 @@ class Santorini:
         return all(0 <= axis < BOARD_SIZE for axis in pos)
 
     def is_winning_action(self, action: Action):
-        return (self._board[action.worker] == 2 and self._board[action.destination] == 3) or not self.apply_legal_action(action).has_legal_action
+        return self.is_winning_action_id(action.as_index(self))
+
+    def is_winning_action_id(self, action_id: int, next_game: 'Santorini' = None):
+        # Pass the result of `apply_legal_action_id` as `next_game` when it is already available to avoid applying the action twice.
+        worker = self.current_player.workers[ACTION_WORKER_INDEX[action_id]]
+        if self._board[worker] == 2 and self._board[ACTION_DESTINATION[action_id]] == 3:
+            return True
+
+        if next_game is None:
+            next_game = self.apply_legal_action_id(action_id)
+        return not next_game.has_legal_action
 
     @cached_property
     def has_legal_action(self):
         try:
-            next(self.get_legal_actions())
+            next(self.get_legal_action_ids())
             return True
         except StopIteration:
             return False
@@ -148,26 +205,38 @@ class Santorini:
         return True
     
     def get_legal_actions(self):
-        for worker in self.current_player.workers:
-            for move_direction in DIRECTIONS:
-                for build_direction in DIRECTIONS:
-                    action = Action(
-                        worker,
-                        worker + move_direction,
-                        worker + move_direction + build_direction
-                    )
-
-                    if self.is_legal_action(action, safe=False):
-                        yield action
+        for action_id in self.get_legal_action_ids():
+            yield Action.from_index(self, action_id)
+
+    def get_legal_action_ids(self):
+        # Same rules as `is_legal_action(safe=False)`, but only on precomputed on-board candidates and without building actions.
+        board = self._board
+        workers = self.workers
+
+        for worker_idx, worker in enumerate(self.current_player.workers):
+            max_height = board[worker] + 1
+            for destination, builds in ACTION_CANDIDATES[worker]:
+                if board[destination] > max_height or board[destination] == 4 or destination in workers:
+                    continue
+
+                for offset, build in builds:
+                    if build == worker or not (board[build] == 4 or build in workers):
+                        yield worker_idx * WORKER_ACTIONS + offset
     
-    # @lru_cache(maxsize=None)
     def apply_legal_action(self, action):
+        return self.apply_legal_action_id(action.as_index(self))
+
+    # @lru_cache(maxsize=None)
+    def apply_legal_action_id(self, action_id: int):
+        worker = self.current_player.workers[ACTION_WORKER_INDEX[action_id]]
+        destination = ACTION_DESTINATION[action_id]
+
         board = self.board
-        board[action.build] += 1
+        board[ACTION_BUILD[action_id]] += 1
 
         return Santorini(
-            self.player_0.move_worker(action.worker, action.destination) if self.current_player_id == 0 else self.player_0, 
-            self.player_1.move_worker(action.worker, action.destination) if self.current_player_id == 1 else self.player_1, 
+            self.player_0.move_worker(worker, destination) if self.current_player_id == 0 else self.player_0, 
+            self.player_1.move_worker(worker, destination) if self.current_player_id == 1 else self.player_1, 
             board,
             self.turn + 1
         )
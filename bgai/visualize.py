@@ -1,13 +1,12 @@
 import enum
-from sqlite3 import Timestamp
-from typing import Iterable, List, Tuple, Union
+from itertools import islice
+from typing import Iterable, List, Optional, Tuple, Union
 from os.path import expanduser
 
 import numpy as np
 from numpy.typing import ArrayLike
-import plotly.express as px
-import plotly.graph_objects as go
 
+from bgai.record import GameRecord
 from bgai.santorini import BOARD_SHAPE, Action, Santorini
 
 
@@ -37,6 +36,9 @@ def game_as_marker_array(game: Santorini):
 
 
 def render_plotly(timesteps: List[Santorini]):
+    # plotly.express pulls in pandas, only pay for that import once something is actually rendered.
+    import plotly.express as px
+
     if isinstance(timesteps, list):
         init_game = timesteps[0]
         fig = px.imshow(
@@ -85,6 +87,18 @@ def render_history(game: Santorini, history: Iterable[Action]):
     
     return render_plotly(timesteps)
 
+
+def render_record(record: GameRecord, ply: Optional[int] = None, markers: Tuple[str] = ('0', '1')):
+    # Frames are replayed on demand, rendering a single ply does not replay the rest of the game.
+    if ply is None:
+        return render_plotly(list(record.iter_games(markers)))
+
+    if not 0 <= ply <= len(record):
+        raise IndexError(f"Ply {ply} is out of range for a game record with {len(record)} plies")
+
+    return render_plotly(next(islice(record.iter_games(markers), ply, None)))
+
+
 def render_path(path, show=True):
     timesteps = []
 
@@ -0,0 +1,100 @@
+import random
+
+import numpy as np
+import pytest
+
+from bgai.play import play_game
+from bgai.player import RandomPlayer
+from bgai.record import HEADER_DTYPE, MAGIC, VERSION, GameRecord, GameRecordFile, replay, write_records
+from bgai.santorini import BOARD_SHAPE, Santorini
+
+
+@pytest.fixture
+def games():
+    random.seed(0)
+    players = RandomPlayer(0, 'R'), RandomPlayer(1, 'M')
+
+    games = []
+    for _ in range(10):
+        game = Santorini.random_init(markers=('R', 'M'))
+        games.append((game, play_game(game, players)))
+    return games
+
+
+def test_file_round_trip(tmp_path, games):
+    path = str(tmp_path / "games.bgar")
+    write_records(path, (GameRecord.from_history(game, history) for game, history in games))
+
+    records = GameRecordFile(path)
+    assert len(records) == len(games)
+    assert list(records.lengths) == [len(history) for _, history in games]
+
+    for (game, history), record in zip(games, records):
+        initial_game, replayed_history = record.to_history(markers=('R', 'M'))
+        assert initial_game.workers == game.workers
+        assert replayed_history == history
+
+
+def test_replay_matches_iter_games(games):
+    records = [GameRecord.from_history(game, history) for game, history in games]
+    boards, workers, lengths = replay(records)
+
+    assert list(lengths) == [len(record) for record in records]
+    for g, record in enumerate(records):
+        for t, game in enumerate(record.iter_games()):
+            assert (boards[g, t] == game._board).all()
+            assert list(workers[g, t]) == [np.ravel_multi_index(worker, BOARD_SHAPE) for worker in game.workers]
+
+        # Finished games keep repeating their final state
+        assert (boards[g, len(record):] == boards[g, len(record)]).all()
+
+
+def test_empty_file(tmp_path):
+    path = str(tmp_path / "empty.bgar")
+    write_records(path, [])
+
+    records = GameRecordFile(path)
+    assert len(records) == 0
+    assert list(records) == []
+
+    boards, workers, lengths = replay(records)
+    assert boards.shape == (0, 1, *BOARD_SHAPE)
+    assert len(lengths) == 0
+
+
+def test_zero_length_game(tmp_path, games):
+    game, history = games[0]
+    path = str(tmp_path / "games.bgar")
+    write_records(path, [GameRecord.from_history(game, ()), GameRecord.from_history(game, history)])
+
+    records = GameRecordFile(path)
+    assert len(records[0]) == 0
+    assert records[0].to_history()[1] == ()
+    assert records[1].to_history()[1] == history
+
+    boards, workers, lengths = replay(records)
+    assert list(lengths) == [0, len(history)]
+    assert not boards[0].any()
+
+
+def test_from_history_rejects_started_games(games):
+    game, history = games[0]
+
+    with pytest.raises(ValueError):
+        GameRecord.from_history(game.apply_legal_action(history[0]), history[1:])
+
+
+def test_rejects_bad_magic_and_version(tmp_path):
+    header = np.zeros(1, dtype=HEADER_DTYPE)
+
+    header[0] = (b"NOPE", VERSION, 0)
+    path = tmp_path / "magic.bgar"
+    path.write_bytes(header.tobytes())
+    with pytest.raises(ValueError, match="not a game record file"):
+        GameRecordFile(str(path))
+
+    header[0] = (MAGIC, VERSION + 1, 0)
+    path = tmp_path / "version.bgar"
+    path.write_bytes(header.tobytes())
+    with pytest.raises(ValueError, match="Unsupported game record version"):
+        GameRecordFile(str(path))
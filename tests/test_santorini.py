@@ -0,0 +1,45 @@
+import random
+
+import numpy as np
+import pytest
+
+from bgai.santorini import BOARD_SHAPE, DIRECTIONS, POLICY_SHAPE, Action, Santorini
+
+
+def random_games(count: int):
+    random.seed(0)
+    np.random.seed(0)
+
+    for _ in range(count):
+        game = Santorini.random_init()
+        # Heights up to and including domes, but workers never stand on a dome.
+        board = np.random.randint(0, 5, size=BOARD_SHAPE)
+        for worker in game.workers:
+            board[worker] = min(board[worker], 3)
+        yield Santorini(game.player_0, game.player_1, board, turn=random.randint(0, 10))
+
+
+def brute_force_legal_actions(game: Santorini):
+    for worker in game.current_player.workers:
+        for move_direction in DIRECTIONS:
+            for build_direction in DIRECTIONS:
+                action = Action(worker, worker + move_direction, worker + move_direction + build_direction)
+                if game.is_legal_action(action, safe=False):
+                    yield action
+
+
+@pytest.mark.parametrize("game", list(random_games(300)))
+def test_legal_actions_match_brute_force(game):
+    actions = list(game.get_legal_actions())
+
+    assert actions == list(brute_force_legal_actions(game))
+    assert [action.as_index(game) for action in actions] == list(game.get_legal_action_ids())
+
+
+@pytest.mark.parametrize("game", list(random_games(50)))
+def test_action_index_round_trip(game):
+    for action in game.get_legal_actions():
+        index = action.as_index(game)
+
+        assert index == np.ravel_multi_index(action.as_tuple(game), POLICY_SHAPE)
+        assert Action.from_index(game, index) == action
@@ -0,0 +1,37 @@
+import json
+import subprocess
+import sys
+from pathlib import Path
+
+
+# Self-play workers and every cli call pay this import, it should only need NumPy.
+STARTUP_MODULES = ("bgai.alphazero.training", "bgai.play", "bgai.record")
+HEAVY_MODULES = ("plotly", "pandas", "scipy")
+MAX_IMPORT_SECONDS = 2.0
+REPO_ROOT = Path(__file__).resolve().parents[1]
+
+
+def _import_in_subprocess():
+    code = (
+        "import json, sys\n"
+        "from time import perf_counter\n"
+        "start = perf_counter()\n"
+        f"import {', '.join(STARTUP_MODULES)}\n"
+        "elapsed = perf_counter() - start\n"
+        "print(json.dumps({'elapsed': elapsed, 'modules': sorted(sys.modules)}))\n"
+    )
+    result = subprocess.run([sys.executable, "-c", code], cwd=REPO_ROOT, capture_output=True, text=True, check=True)
+    return json.loads(result.stdout)
+
+
+def test_startup_does_not_import_heavy_dependencies():
+    modules = _import_in_subprocess()["modules"]
+    loaded = [name for name in modules if name.split(".")[0] in HEAVY_MODULES]
+
+    assert not loaded, f"Importing {STARTUP_MODULES} loaded {loaded}"
+
+
+def test_startup_import_time():
+    elapsed = _import_in_subprocess()["elapsed"]
+
+    assert elapsed < MAX_IMPORT_SECONDS, f"Importing {STARTUP_MODULES} took {elapsed:.2f}s"
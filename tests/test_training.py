@@ -0,0 +1,94 @@
+import threading
+from concurrent.futures import Future
+
+import numpy as np
+import pytest
+
+from bgai.alphazero.training import SantoriniTracker, TrainerLink, augment, trainer
+from bgai.santorini import BOARD_SIZE, POLICY_SHAPE
+
+BATCH_SIZE = 8
+
+
+def fake_tracker(actions: int):
+    tracker = SantoriniTracker()
+    for _ in range(actions):
+        visits = np.random.rand(*POLICY_SHAPE).astype(np.float32)
+        tracker.states.append(np.random.randint(0, 4, size=(5, BOARD_SIZE, BOARD_SIZE)))
+        tracker.visits.append(visits / visits.sum())
+        tracker.action_count += 1
+    return tracker
+
+
+@pytest.fixture
+def link():
+    link = TrainerLink(window_size=4, batch_size=BATCH_SIZE, fetch_min_wait=0.05)
+    for actions in (3, 0, 5):
+        link.publish_tracker(fake_tracker(actions))
+    return link
+
+
+def test_augment_keeps_policy_distribution():
+    tracker = fake_tracker(1)
+    state, visits = tracker.states[0], tracker.visits[0]
+
+    for _ in range(20):
+        augmented_state, augmented_visits = augment(state, visits)
+        assert augmented_state.shape == state.shape
+        assert augmented_visits.shape == POLICY_SHAPE
+        assert np.isclose(augmented_visits.sum(), 1)
+        assert sorted(augmented_state.flatten()) == sorted(state.flatten())
+
+
+def test_trainer_batches_and_snapshots(link):
+    threads = threading.active_count()
+    batches = []
+
+    def recorder(batch):
+        batches.append(batch)
+        return len(batches)
+
+    trainer(link, steps=7, train_step=recorder, snapshot_interval=3)
+
+    assert len(batches) == 7
+    for batch in batches:
+        assert batch.states.shape == (BATCH_SIZE, 5, BOARD_SIZE, BOARD_SIZE)
+        assert batch.visits.shape == (BATCH_SIZE, *POLICY_SHAPE)
+        assert np.allclose(batch.visits.reshape(BATCH_SIZE, -1).sum(axis=1), 1)
+
+    # Published after step 3, step 6 and the final step
+    assert link.snapshot == (3, 7)
+    assert threading.active_count() == threads
+
+
+def test_trainer_raises_train_step_exception(link):
+    threads = threading.active_count()
+
+    def failing_step(batch):
+        raise RuntimeError("train step failed")
+
+    with pytest.raises(RuntimeError, match="train step failed"):
+        trainer(link, steps=2, train_step=failing_step)
+    assert threading.active_count() == threads
+
+
+def test_trainer_raises_stage_exception(link, monkeypatch):
+    threads = threading.active_count()
+
+    def failing_sample():
+        raise RuntimeError("sampling failed")
+
+    monkeypatch.setattr(link, "sample_batch", failing_sample)
+
+    with pytest.raises(RuntimeError, match="sampling failed"):
+        trainer(link, steps=2)
+    assert threading.active_count() == threads
+
+
+def test_trainer_raises_runner_exception():
+    link = TrainerLink(window_size=4, batch_size=BATCH_SIZE, fetch_min_wait=0.05)
+    runner = Future()
+    runner.set_exception(RuntimeError("runner failed"))
+
+    with pytest.raises(RuntimeError, match="runner failed"):
+        trainer(link, steps=2, runners=[runner])